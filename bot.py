@@ -1,4 +1,6 @@
 import os
+import math
+import asyncio
 import discord
 import logging
 from datetime import datetime
@@ -8,6 +10,7 @@ from discord.ext import commands, tasks
 from discord.ui import Button, View, Select
 from dotenv import load_dotenv
 from agent import ProbeAndAnswerAgent
+from profiling import SamplingProfiler, SlowCallbackMonitor, PROFILE_DIR, PROFILE_DEFAULT_SECONDS, PROFILE_MAX_SECONDS, SLOW_CALLBACK_THRESHOLD
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.metrics.pairwise import cosine_similarity
 
@@ -39,6 +42,22 @@ bot = commands.Bot(command_prefix=PREFIX, intents=intents)
 # Import the agents from the agent.py file
 probe_and_answer_agent = ProbeAndAnswerAgent()
 
+# Profiling / event loop monitoring (see profiling.py)
+slow_callback_threshold = os.getenv('SLOW_CALLBACK_THRESHOLD')
+try:
+    slow_callback_threshold = float(slow_callback_threshold) if slow_callback_threshold else SLOW_CALLBACK_THRESHOLD
+except ValueError:
+    slow_callback_threshold = None
+
+# Reject zero/negative (and nan/inf) values, which would make the watchdog spin
+if slow_callback_threshold is None or not math.isfinite(slow_callback_threshold) or slow_callback_threshold <= 0:
+    logger.error(f"Invalid SLOW_CALLBACK_THRESHOLD in your .env file, must be a positive number of seconds. Using {SLOW_CALLBACK_THRESHOLD}s")
+    slow_callback_threshold = SLOW_CALLBACK_THRESHOLD
+
+profiler = SamplingProfiler(output_dir=os.getenv('PROFILE_DIR', PROFILE_DIR))
+slow_callback_monitor = SlowCallbackMonitor(threshold=slow_callback_threshold)
+profile_stop_lock = asyncio.Lock()
+
 # At the top with other constants
 response_channel_id = 1337581994648932363
 guild_id = 1326353542037901352
@@ -211,6 +230,9 @@ async def on_ready():
     global questions_channel
     logger.info(f"{bot.user} has connected to Discord!")
 
+    # on_ready can fire again on reconnect; start() is a no-op if already running
+    slow_callback_monitor.start()
+
     # Fetch the response channel
     guild = bot.get_guild(guild_id)
     if not guild:
@@ -582,5 +604,64 @@ async def stop_sorting(ctx):
         logger.error(error_message)
         await ctx.send(error_message)
 
+@bot.command(name="profile", help="Profiles the bot (admin only). Usage: !profile start [seconds] | !profile stop")
+@commands.has_permissions(administrator=True)
+async def profile(ctx, action: str, seconds: int = PROFILE_DEFAULT_SECONDS):
+    try:
+        if action == "start":
+            if profiler.is_running():
+                await ctx.send("Profiler is already running. To stop, use !profile stop.")
+                return
+            seconds = max(1, min(seconds, PROFILE_MAX_SECONDS))
+            loop = asyncio.get_running_loop()
+
+            # Called from the profiler thread, so hand the message back to the event loop
+            def on_complete(output_path):
+                if output_path is None:
+                    message = "Profiling window finished, but the profile could not be written. Check the logs."
+                else:
+                    # Include the path, since a new !profile start before collecting it drops the upload
+                    message = f"Profiling window finished. Profile written to `{output_path}`. Use !profile stop to upload it."
+                asyncio.run_coroutine_threadsafe(ctx.send(message), loop)
+
+            profiler.start(seconds, on_complete=on_complete)
+            await ctx.send(f"Started profiling for up to {seconds} seconds. To stop early, use !profile stop.")
+            logger.info(f"Profiling started by {ctx.author} for {seconds}s")
+        elif action == "stop":
+            # Overlapping stops would otherwise both pass the check below
+            async with profile_stop_lock:
+                # A profile that has already been collected is not returned again
+                if not profiler.is_running() and profiler.output_path is None:
+                    await ctx.send("Profiler was not running!")
+                    return
+                # Joining the sampler thread and writing the file happen off the event loop
+                output_path = await asyncio.to_thread(profiler.stop)
+            if output_path is None:
+                await ctx.send("Profiler stopped, but the profile could not be written. Check the logs.")
+                return
+            await ctx.send(f"Profile written to `{output_path}` (collapsed stack format).")
+            # Long captures can exceed Discord's attachment limit, in which case only the path is shared
+            filesize_limit = ctx.guild.filesize_limit if ctx.guild else 10 * 1024 * 1024
+            if os.path.getsize(output_path) <= filesize_limit:
+                await ctx.send(file=discord.File(output_path))
+            else:
+                await ctx.send("The profile is too large to upload here. Fetch it from the path above on the bot's host.")
+            logger.info(f"Profiling stopped by {ctx.author}")
+        else:
+            await ctx.send("Usage: !profile start [seconds] | !profile stop")
+    except Exception as e:
+        error_message = f"Error running profiler: {str(e)}"
+        logger.error(error_message)
+        await ctx.send(error_message)
+
+@profile.error
+async def profile_error(ctx, error):
+    if isinstance(error, commands.MissingPermissions):
+        await ctx.send("Only server administrators can use !profile.")
+    elif isinstance(error, (commands.MissingRequiredArgument, commands.BadArgument)):
+        await ctx.send("Usage: !profile start [seconds] | !profile stop")
+    else:
+        logger.error(f"Error in profile command: {error}")
+
 # Start the bot, connecting it to the gateway
 bot.run(token)
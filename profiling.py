@@ -0,0 +1,173 @@
+import os
+import sys
+import time
+import asyncio
+import logging
+import threading
+import traceback
+from collections import Counter
+from datetime import datetime
+
+logger = logging.getLogger("discord")
+
+PROFILE_DIR = "profiles"
+PROFILE_INTERVAL = 0.005  # seconds between samples (~200 Hz)
+PROFILE_DEFAULT_SECONDS = 60
+PROFILE_MAX_SECONDS = 300
+
+# asyncio's own debug-mode default for slow callbacks is 100ms
+SLOW_CALLBACK_THRESHOLD = 0.1
+
+
+def format_frame(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})"
+
+
+def collapse_stack(frame) -> str:
+    # Collapsed stacks are root-first, joined by ';'
+    frames = []
+    while frame is not None:
+        frames.append(format_frame(frame))
+        frame = frame.f_back
+    return ";".join(reversed(frames))
+
+
+class SamplingProfiler:
+    """
+    Samples the event loop thread's stack from a background thread and writes
+    the result in collapsed-stack format (usable with flamegraph.pl, speedscope, etc.).
+    """
+
+    def __init__(self, interval: float = PROFILE_INTERVAL, output_dir: str = PROFILE_DIR):
+        self.interval = interval
+        self.output_dir = output_dir
+        self.samples = Counter()
+        self.output_path = None
+        self._target_thread_id = None
+        self._on_complete = None
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, duration: float, target_thread_id: int = None, on_complete=None):
+        """on_complete(path) is called from the profiler thread if the window ends without stop()."""
+        if self.is_running():
+            raise RuntimeError("Profiler is already running")
+
+        self.samples = Counter()
+        self.output_path = None
+        self._target_thread_id = target_thread_id or threading.get_ident()
+        self._on_complete = on_complete
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, args=(duration,), name="profiler", daemon=True)
+        self._thread.start()
+        logger.info(f"Profiler started for up to {duration:.0f}s")
+
+    def stop(self) -> str:
+        """
+        Stops sampling (if still running) and returns the path of the written profile.
+        Each profile is only returned once; later calls return None.
+        """
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+        output_path, self.output_path = self.output_path, None
+        return output_path
+
+    def _run(self, duration: float):
+        deadline = time.monotonic() + duration
+        while not self._stop_event.wait(self.interval) and time.monotonic() < deadline:
+            frame = sys._current_frames().get(self._target_thread_id)
+            if frame is not None:
+                self.samples[collapse_stack(frame)] += 1
+            del frame
+
+        try:
+            self.output_path = self._write()
+            logger.info(f"Profiler stopped with {sum(self.samples.values())} samples, written to {self.output_path}")
+        except Exception as e:
+            logger.error(f"Failed to write profile: {e}")
+
+        if not self._stop_event.is_set() and self._on_complete is not None:
+            try:
+                self._on_complete(self.output_path)
+            except Exception as e:
+                logger.error(f"Error in profiler completion callback: {e}")
+
+    def _write(self) -> str:
+        os.makedirs(self.output_dir, exist_ok=True)
+        filename = datetime.now().strftime("profile-%Y%m%d-%H%M%S-%f.collapsed")
+        path = os.path.join(self.output_dir, filename)
+        with open(path, "w") as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+        return path
+
+
+class SlowCallbackMonitor:
+    """
+    Watchdog thread that pings the event loop and, whenever the loop fails to
+    respond within the threshold, logs the stack that is blocking it.
+    """
+
+    def __init__(self, threshold: float = SLOW_CALLBACK_THRESHOLD):
+        self.threshold = threshold
+        self._loop = None
+        self._loop_thread_id = None
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, loop: asyncio.AbstractEventLoop = None):
+        """Must be called from the event loop thread."""
+        if self.is_running():
+            return
+
+        self._loop = loop or asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="slow-callback-monitor", daemon=True)
+        self._thread.start()
+        logger.info(f"Slow callback monitor started (threshold {self.threshold * 1000:.0f}ms)")
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        # Gap between pings scales with the threshold, so a block is caught soon
+        # after it starts and a larger threshold means fewer wakeups of the loop
+        ping_interval = self.threshold / 10
+
+        while not self._stop_event.is_set():
+            responded = threading.Event()
+            sent = time.monotonic()
+            try:
+                self._loop.call_soon_threadsafe(responded.set)
+            except RuntimeError:
+                # Loop has been closed
+                return
+
+            if responded.wait(self.threshold):
+                self._stop_event.wait(ping_interval)
+                continue
+
+            # The loop is blocked: capture what it is running right now
+            frame = sys._current_frames().get(self._loop_thread_id)
+            stack = "".join(traceback.format_stack(frame)) if frame is not None else "<unavailable>\n"
+            del frame
+
+            # Wait for the loop to recover so the full blocking time is reported once
+            while not responded.wait(self.threshold):
+                if self._stop_event.is_set() or self._loop.is_closed():
+                    return
+
+            blocked = time.monotonic() - sent
+            if blocked > self.threshold:
+                logger.warning(f"Event loop blocked for {blocked * 1000:.0f}ms (threshold {self.threshold * 1000:.0f}ms). Stack:\n{stack}")
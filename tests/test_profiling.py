@@ -0,0 +1,46 @@
+import time
+import asyncio
+import logging
+
+from profiling import SlowCallbackMonitor
+
+THRESHOLD = 0.1
+
+
+def busy_wait(seconds):
+    end = time.monotonic() + seconds
+    while time.monotonic() < end:
+        pass
+
+
+def run_blocks(durations):
+    async def main():
+        monitor = SlowCallbackMonitor(threshold=THRESHOLD)
+        monitor.start()
+        for duration in durations:
+            # Let the watchdog see the loop responding before each block
+            await asyncio.sleep(THRESHOLD)
+            busy_wait(duration)
+        await asyncio.sleep(THRESHOLD * 2)
+        # stop() joins the watchdog, so run it off the loop it is watching
+        await asyncio.to_thread(monitor.stop)
+
+    asyncio.run(main())
+
+
+def slow_callback_warnings(caplog):
+    return [r.getMessage() for r in caplog.records if r.getMessage().startswith("Event loop blocked")]
+
+
+def test_block_under_threshold_is_not_reported(caplog):
+    caplog.set_level(logging.INFO, logger="discord")
+    run_blocks([THRESHOLD * 0.8] * 5)
+    assert slow_callback_warnings(caplog) == []
+
+
+def test_block_over_threshold_is_reported_with_blocking_stack(caplog):
+    caplog.set_level(logging.INFO, logger="discord")
+    run_blocks([THRESHOLD * 1.5])
+    warnings = slow_callback_warnings(caplog)
+    assert len(warnings) == 1
+    assert "busy_wait" in warnings[0]